@@ -1,9 +1,82 @@
 # KC_amplitude_futures.py
+import os
+import sys
+import time
+import threading
 import requests
 import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List, Dict, Optional
 
+from kline_time import format_local_times
+
+try:
+    import orjson  # 可选：C 扩展 JSON 解析/序列化，显著加快K线解析与结果写入
+except ImportError:
+    orjson = None
+
+# 直接从响应字节解码，orjson 可用时跳过 requests 的文本解码与标准库解析
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+@dataclass
+class DownKlines:
+    """
+    下跌K线的列式存储：每个字段一列连续的 ndarray，保持原始时间顺序。
+    排序只作用于 amplitude 一列，字典只在输出前 N 条或保存时才生成。
+    """
+    index: np.ndarray           # 原始K线序号（从 1 开始）
+    open_time: np.ndarray       # 开盘时间（毫秒）
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    amplitude: np.ndarray
+    change_percent: np.ndarray
+
+    @classmethod
+    def empty(cls) -> 'DownKlines':
+        ints = np.empty(0, dtype=np.int64)
+        return cls(ints, ints, *(np.empty(0, dtype=np.float64) for _ in range(7)))
+
+    def __len__(self) -> int:
+        return self.amplitude.size
+
+    def ranked(self, top_n: Optional[int] = None) -> np.ndarray:
+        """按振幅降序（同振幅按时间先后）返回行下标；top_n 为 None 返回全部"""
+        amp = self.amplitude
+        if top_n is not None and 0 < top_n < amp.size:
+            # 只需前 top_n：先 O(N) 分区求出第 top_n 大的振幅，再对不小于它的行做稳定排序；
+            # 与该值并列的行全部参与排序，保证截断处同样按时间先后取舍
+            kth = amp[np.argpartition(-amp, top_n - 1)[top_n - 1]]
+            candidates = np.flatnonzero(amp >= kth)
+            return candidates[np.argsort(-amp[candidates], kind='stable')][:top_n]
+        order = np.argsort(-amp, kind='stable')
+        return order if top_n is None else order[:max(top_n, 0)]
+
+    def to_dicts(self, top_n: Optional[int] = None) -> List[Dict]:
+        """按振幅降序生成详情字典列表，时间批量格式化"""
+        order = self.ranked(top_n)
+        times = format_local_times(self.open_time[order])
+        return [{
+            'index': int(self.index[j]),
+            'time': t,
+            'open': float(self.open[j]),
+            'high': float(self.high[j]),
+            'low': float(self.low[j]),
+            'close': float(self.close[j]),
+            'volume': float(self.volume[j]),
+            'amplitude': float(self.amplitude[j]),
+            'change_percent': float(self.change_percent[j])
+        } for j, t in zip(order, times)]
+
+
 class SingleCoinAmplitudeAnalyzer:
     """
     支持市场 market='spot' 或 'futures'（USDT 合约 via fapi）
@@ -17,12 +90,31 @@ class SingleCoinAmplitudeAnalyzer:
         'futures': "https://fapi.binance.com/fapi/v1",   # USDT 永续/交割合约的 REST
         # 如果需要 COIN-M（交割合约）可扩展 'coin_m': "https://dapi.binance.com/dapi/v1"
     }
+    # K 线周期对应的秒数，同时作为本地缓存的有效期（TTL）
+    INTERVAL_SECONDS = {
+        '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+        '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800, '12h': 43200,
+        '1d': 86400, '3d': 259200, '1w': 604800, '1M': 2592000,
+    }
+    # 多币种分析时的最大并发请求数（Binance 权重限制 1200/分钟）
+    MAX_WORKERS = 10
+    # print_results 的表格模板（预先构建，逐行只做一次 format）
+    RULE = '='*100
+    TABLE_HEADER = f"{'排名':<4} {'时间':<19} {'下探振幅%':<10} {'涨跌%':<8} {'开盘':<12} {'最高':<12} {'最低':<12} {'收盘':<12}"
+    ROW_FORMAT = ("{0:<4} {time:<19} {amplitude:<9.2f}% {change_percent:<7.2f}% "
+                  "{open:<12.6f} {high:<12.6f} {low:<12.6f} {close:<12.6f}")
 
-    def __init__(self, market: str = 'futures', proxy_config: Optional[Dict] = None):
+    def __init__(self, market: str = 'futures', proxy_config: Optional[Dict] = None,
+                 cache_dir: Optional[str] = '.cache'):
         if market not in self.MARKET_ENDPOINTS:
             raise ValueError("market must be one of: " + ", ".join(self.MARKET_ENDPOINTS.keys()))
         self.base_url = self.MARKET_ENDPOINTS[market]
         self.session = requests.Session()
+        # 连接池大小与多币种并发数一致，429/5xx 自动指数退避重试
+        self.session.mount('https://', HTTPAdapter(
+            pool_maxsize=self.MAX_WORKERS,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        ))
         if proxy_config:
             self.session.proxies.update(proxy_config)
             print(f"✅ 已配置代理: {proxy_config}")
@@ -30,107 +122,168 @@ class SingleCoinAmplitudeAnalyzer:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
         self.market = market
+        self.cache_dir = cache_dir  # None 表示不使用本地缓存
 
     def get_kline_data(self, symbol: str, interval: str = '1h', limit: int = 500) -> Optional[List]:
-        """获取 K 线，limit 最大1000（Binance 限制）"""
+        """获取 K 线，limit 最大1000（Binance 限制）；已收盘的K线优先从本地缓存复用"""
+        limit = min(max(1, int(limit)), 1000)
+        path = self._cache_path(symbol, interval)
+        cached = self._load_cache(path) if path else None
+        if cached and len(cached['data']) >= limit:
+            ttl = self.INTERVAL_SECONDS[interval]
+            if time.time() - cached['timestamp'] < ttl:
+                print(f"⚡ [{self.market}] 使用缓存的 {symbol} {limit} 根 {interval} K 线数据")
+                return cached['data'][-limit:]
+            # 已收盘K线不会再变化，只补拉缓存最后一根（可能未收盘）及之后的K线
+            last_open = int(cached['data'][-1][0])
+            missing = int((time.time() * 1000 - last_open) // (ttl * 1000)) + 2
+            if missing < limit:
+                fresh = self._fetch_klines(symbol, interval, missing)
+                if fresh and int(fresh[0][0]) <= last_open:
+                    first_open = int(fresh[0][0])
+                    data = [k for k in cached['data'] if int(k[0]) < first_open] + fresh
+                    self._save_cache(path, data[-1000:])
+                    return data[-limit:]
+
+        data = self._fetch_klines(symbol, interval, limit)
+        if data and path:
+            self._save_cache(path, data)
+        return data
+
+    def _cache_path(self, symbol: str, interval: str) -> Optional[str]:
+        if not self.cache_dir or interval not in self.INTERVAL_SECONDS:
+            return None
+        return os.path.join(self.cache_dir, f"{self.market}_{symbol.upper()}_{interval}.json")
+
+    def _load_cache(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'rb') as f:
+                return _loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _save_cache(self, path: str, data: List):
+        """先写临时文件再替换，并发写同一币种时不会留下半个文件"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'timestamp': time.time(), 'data': data}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  写入缓存失败: {e}")
+
+    def _fetch_klines(self, symbol: str, interval: str, limit: int) -> Optional[List]:
         try:
             url = f"{self.base_url}/klines"
             params = {
                 'symbol': symbol.upper(),
                 'interval': interval,
-                'limit': min(max(1, int(limit)), 1000)
+                'limit': limit
             }
             print(f"🔄 [{self.market}] 正在获取 {symbol} 的 {params['limit']} 根 {interval} K 线数据...")
             resp = self.session.get(url, params=params, timeout=15)
             resp.raise_for_status()
-            data = resp.json()
+            data = _loads(resp.content)
             print(f"✅ 成功获取 {len(data)} 根K线数据")
             return data
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"❌ 获取 {symbol} K线失败: {e}")
             return None
 
     def analyze_klines(self, symbol: str, interval: str = '1h', limit: int = 500,
-                       amplitude_mode: str = 'down_percent') -> List[Dict]:
+                       amplitude_mode: str = 'down_percent') -> DownKlines:
         """
         分析 K 线，但只保留下跌 K 线（close < open）。
         amplitude_mode: 'down_percent' 或 'range'
-        返回按 amplitude 降序的下跌K线列表（完整详情，不限制 top n）。
+        返回全部下跌K线的列式结果；排序和详情由 get_top_amplitudes / save_results 按需生成。
         """
         kline_data = self.get_kline_data(symbol, interval, limit)
         if not kline_data:
-            return []
-
-        results = []
-        for i, k in enumerate(kline_data):
-            open_time = int(k[0])
-            open_price = float(k[1])
-            high_price = float(k[2])
-            low_price = float(k[3])
-            close_price = float(k[4])
-            volume = float(k[5])
-
-            # 只处理下跌 K 线
-            if close_price >= open_price:
-                continue
-
-            # 计算振幅：两种模式
-            if amplitude_mode == 'range':
-                # 保留你原来的度量（high-low）/low
-                amplitude = ((high_price - low_price) / low_price) * 100 if low_price > 0 else 0.0
-            else:
-                # down_percent: 以开盘价为基准衡量下探幅度
-                amplitude = ((open_price - low_price) / open_price) * 100 if open_price > 0 else 0.0
-
-            change_percent = ((close_price - open_price) / open_price) * 100 if open_price > 0 else 0.0
-            time_str = datetime.fromtimestamp(open_time / 1000).strftime('%Y-%m-%d %H:%M:%S')
-
-            results.append({
-                'index': i + 1,
-                'time': time_str,
-                'open': open_price,
-                'high': high_price,
-                'low': low_price,
-                'close': close_price,
-                'volume': volume,
-                'amplitude': amplitude,
-                'change_percent': change_percent
-            })
-
-        # 按振幅降序排序（最大下探优先）
-        results_sorted = sorted(results, key=lambda x: x['amplitude'], reverse=True)
-        return results_sorted
-
-    def get_top_amplitudes(self, results: List[Dict], top_n: int = 15) -> List[Dict]:
-        return results[:top_n]
+            return DownKlines.empty()
+
+        # 先按列转置，再一次性解析为类型化数组：每列在内存中连续，避免逐行 float() 转换
+        cols = list(zip(*kline_data))
+        open_time = np.array(cols[0], dtype=np.int64)
+        o, h, l, c, v = np.array(cols[1:6], dtype=np.float64)
+
+        # 只处理下跌 K 线
+        down = np.flatnonzero(c < o)
+        if down.size == 0:
+            return DownKlines.empty()
+        o, h, l, c, v, open_time = o[down], h[down], l[down], c[down], v[down], open_time[down]
+
+        # 计算振幅：两种模式（分母 <= 0 时振幅记为 0）
+        safe_o = np.where(o > 0, o, 1.0)
+        if amplitude_mode == 'range':
+            # 保留你原来的度量（high-low）/low
+            amp = np.where(l > 0, (h - l) / np.where(l > 0, l, 1.0) * 100, 0.0)
+        else:
+            # down_percent: 以开盘价为基准衡量下探幅度
+            amp = np.where(o > 0, (o - l) / safe_o * 100, 0.0)
+        chg = np.where(o > 0, (c - o) / safe_o * 100, 0.0)
+
+        return DownKlines(index=down + 1, open_time=open_time, open=o, high=h, low=l, close=c,
+                          volume=v, amplitude=amp, change_percent=chg)
+
+    def analyze_symbols(self, symbols: List[str], interval: str = '1h', limit: int = 500,
+                        amplitude_mode: str = 'down_percent') -> Dict[str, DownKlines]:
+        """
+        并发分析多个币种，返回 {symbol: analyze_klines 结果}。
+        网络请求在线程池中重叠进行，并发数不超过 MAX_WORKERS；
+        单个币种出错只记为空结果，不影响其他币种；重复的币种只分析一次。
+        """
+        symbols = list(dict.fromkeys(symbols))
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, max(1, len(symbols)))) as ex:
+            futures = {s: ex.submit(self.analyze_klines, s, interval, limit, amplitude_mode)
+                       for s in symbols}
+        results = {}
+        for s, fut in futures.items():
+            try:
+                results[s] = fut.result()
+            except Exception as e:
+                print(f"❌ 分析 {s} 失败: {e}")
+                results[s] = DownKlines.empty()
+        return results
+
+    def get_top_amplitudes(self, results: DownKlines, top_n: int = 15) -> List[Dict]:
+        return results.to_dicts(top_n)
 
     def print_results(self, symbol: str, top_results: List[Dict], interval: str, market: str):
         if not top_results:
             print("❌ 没有下跌 K 线被统计（或数据为空）")
             return
 
-        print(f"\n{'='*100}")
-        print(f"📉 {symbol} ({market}) - 仅统计下跌 K 线 的 振幅排名 TOP {len(top_results)}  （时间周期={interval}）")
-        print(f"{'='*100}")
-        print(f"{'排名':<4} {'时间':<19} {'下探振幅%':<10} {'涨跌%':<8} {'开盘':<12} {'最高':<12} {'最低':<12} {'收盘':<12}")
-        print("-"*100)
-        for i, r in enumerate(top_results, 1):
-            print(f"{i:<4} {r['time']:<19} {r['amplitude']:<9.2f}% {r['change_percent']:<7.2f}% "
-                  f"{r['open']:<12.6f} {r['high']:<12.6f} {r['low']:<12.6f} {r['close']:<12.6f}")
-        print("="*100)
-
-    def save_results(self, symbol: str, results: List[Dict], interval: str) -> str:
+        lines = [
+            "",
+            self.RULE,
+            f"📉 {symbol} ({market}) - 仅统计下跌 K 线 的 振幅排名 TOP {len(top_results)}  （时间周期={interval}）",
+            self.RULE,
+            self.TABLE_HEADER,
+            "-"*100,
+        ]
+        lines.extend(self.ROW_FORMAT.format(i, **r) for i, r in enumerate(top_results, 1))
+        lines.append(self.RULE)
+        # 整张表拼好后一次写出，避免逐行 print
+        sys.stdout.write("\n".join(lines) + "\n")
+
+    def save_results(self, symbol: str, results: DownKlines, interval: str) -> str:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{symbol}_{interval}_futures_down_amplitude_{timestamp}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump({
-                'symbol': symbol,
-                'market': self.market,
-                'interval': interval,
-                'analysis_time': timestamp,
-                'total_down_klines': len(results),
-                'results': results
-            }, f, ensure_ascii=False, indent=2)
+        save_data = {
+            'symbol': symbol,
+            'market': self.market,
+            'interval': interval,
+            'analysis_time': timestamp,
+            'total_down_klines': len(results),
+            'results': results.to_dicts()
+        }
+        if orjson is not None:
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(save_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(save_data, f, ensure_ascii=False, indent=2)
         return filename
 
 
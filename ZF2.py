@@ -5,27 +5,116 @@
 支持代理访问币安API，可配置K线周期和币种
 """
 
+import os
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time
-import statistics
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from types import MappingProxyType
+from typing import List, Dict, Optional, Tuple, Union
 import argparse
+import functools
+
+import numpy as np
+
+from kline_time import format_local_times
+
+try:
+    import orjson  # 可选：更快的 JSON 解析与序列化
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa  # 可选：--format parquet 时按列压缩保存逐根K线明细
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# K线周期名称映射（只读，多线程共享安全）
+INTERVAL_NAMES = MappingProxyType({
+    '1m': '1分钟', '3m': '3分钟', '5m': '5分钟', '15m': '15分钟',
+    '30m': '30分钟', '1h': '1小时', '2h': '2小时', '4h': '4小时',
+    '6h': '6小时', '8h': '8小时', '12h': '12小时', '1d': '1天',
+    '3d': '3天', '1w': '1周', '1M': '1月'
+})
+
+# K线周期对应的毫秒数（分段获取、缓存补拉时使用；1M 按 31 天近似）
+INTERVAL_MS = MappingProxyType({
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000, '3d': 259_200_000,
+    '1w': 604_800_000, '1M': 2_678_400_000,
+})
+
+
+# 已收盘K线的本地缓存目录（每个交易对/周期一个 .npy 文件）
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'amplitude')
+
+
+# 振幅区间分布的分桶，区间为 [min, max)
+AMPLITUDE_RANGES = [
+    (0, 1, "0-1%"),
+    (1, 2, "1-2%"),
+    (2, 3, "2-3%"),
+    (3, 5, "3-5%"),
+    (5, 10, "5-10%"),
+    (10, float('inf'), ">10%")
+]
+_AMPLITUDE_BIN_EDGES = np.array([min_val for min_val, _, _ in AMPLITUDE_RANGES] + [AMPLITUDE_RANGES[-1][1]],
+                                dtype=np.float64)
+
+
+def _amplitudes(opens: np.ndarray, highs: np.ndarray, lows: np.ndarray) -> np.ndarray:
+    """振幅百分比: (最高价 - 最低价) / 开盘价 * 100，开盘价为 0 时记为 0"""
+    return np.where(opens > 0, (highs - lows) / np.where(opens > 0, opens, 1.0) * 100, 0.0)
+
+
+def _json_loads(data: bytes):
+    """从响应字节解析 JSON，orjson 可用时优先使用"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj) -> bytes:
+    """序列化为缩进 2 的 UTF-8 JSON 字节（不转义中文）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
 
 
 class BinanceKlineAnalyzer:
     """币安K线振幅分析器"""
     
-    def __init__(self, proxy_url: Optional[str] = None):
+    # 同时进行的最大请求数（多币种并发获取时使用，不超过连接池大小）
+    MAX_WORKERS = 8
+    # 币安 /fapi/v1/klines 单次请求的K线数量上限
+    MAX_KLINES_PER_REQUEST = 1500
+    
+    def __init__(self, proxy_url: Optional[str] = None, cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
         """
         初始化分析器
         
         Args:
             proxy_url: 代理地址，格式如 'http://127.0.0.1:7890' 或 'socks5://127.0.0.1:1080'
+            cache_dir: 已收盘K线的缓存目录，None 表示不使用缓存
         """
         self.base_url = "https://fapi.binance.com/fapi/v1"
+        self.cache_dir = cache_dir
         self.session = requests.Session()
+        self._request_slots = threading.Semaphore(self.MAX_WORKERS)
+        
+        # 复用连接池（TCP+TLS 握手只做一次），429/5xx 自动指数退避重试
+        self.session.mount('https://', HTTPAdapter(
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        ))
         
         # 设置代理
         if proxy_url:
@@ -37,13 +126,14 @@ class BinanceKlineAnalyzer:
             'Accept': 'application/json',
         })
         
-        # K线周期映射
-        self.intervals = {
-            '1m': '1分钟', '3m': '3分钟', '5m': '5分钟', '15m': '15分钟',
-            '30m': '30分钟', '1h': '1小时', '2h': '2小时', '4h': '4小时',
-            '6h': '6小时', '8h': '8小时', '12h': '12小时', '1d': '1天',
-            '3d': '3天', '1w': '1周', '1M': '1月'
-        }
+        # K线周期映射（模块级只读表，不再每个实例重建）
+        self.intervals = INTERVAL_NAMES
+        self._interval_ms = INTERVAL_MS
+        
+        # fetch_array 的内存缓存：同一分钟内重复获取同一组参数时直接复用已解析的数组；
+        # 通过弱引用绑定实例，缓存不会让分析器形成循环引用
+        self._fetch_memo = functools.lru_cache(maxsize=64)(
+            functools.partial(BinanceKlineAnalyzer._fetch_minute_snapshot, weakref.proxy(self)))
     
     def setup_proxy(self, proxy_url: str):
         """设置代理"""
@@ -69,7 +159,6 @@ class BinanceKlineAnalyzer:
         Returns:
             K线数据列表
         """
-        url = f"{self.base_url}/klines"
         params = {
             'symbol': symbol.upper(),
             'interval': interval,
@@ -78,10 +167,10 @@ class BinanceKlineAnalyzer:
         
         try:
             print(f"🔄 正在获取 {symbol} {self.intervals.get(interval, interval)} K线数据...")
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            if limit > self.MAX_KLINES_PER_REQUEST:
+                data = self._get_klines_paged(symbol, interval, limit)
+            else:
+                data = self._request_klines(params)
             if not data:
                 raise ValueError("未获取到K线数据")
                 
@@ -93,86 +182,208 @@ class BinanceKlineAnalyzer:
         except json.JSONDecodeError:
             raise Exception("API返回数据格式错误")
     
-    def calculate_amplitude(self, klines: List[List]) -> Dict:
+    def _request_klines(self, params: Dict) -> List[List]:
+        """发送单次K线请求并解析响应"""
+        # 限制并发中的请求数，避免触发币安权重限制（2400/分钟）
+        with self._request_slots:
+            response = self.session.get(f"{self.base_url}/klines", params=params, timeout=30)
+        response.raise_for_status()
+        return _json_loads(response.content)
+    
+    def _get_klines_paged(self, symbol: str, interval: str, total: int) -> List[List]:
+        """
+        分段获取超过单次上限的K线
+        
+        按 startTime/endTime 把最近 total 根K线切成若干时间窗口并发请求，
+        合并后按开盘时间去重排序（相邻窗口边界可能重叠一根）。
+        """
+        if interval not in self._interval_ms:
+            raise ValueError(f"不支持分段获取的K线周期: {interval}")
+        
+        interval_ms = self._interval_ms[interval]
+        window_ms = self.MAX_KLINES_PER_REQUEST * interval_ms
+        current_open = int(time.time() * 1000) // interval_ms * interval_ms
+        start = current_open - (total - 1) * interval_ms
+        end = current_open + interval_ms - 1
+        windows = [(window_start, min(window_start + window_ms - 1, end))
+                   for window_start in range(start, end + 1, window_ms)]
+        
+        def fetch(window: Tuple[int, int]) -> List[List]:
+            return self._request_klines({
+                'symbol': symbol.upper(),
+                'interval': interval,
+                'startTime': window[0],
+                'endTime': window[1],
+                'limit': self.MAX_KLINES_PER_REQUEST
+            })
+        
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(windows))) as executor:
+            pages = list(executor.map(fetch, windows))
+        
+        merged = {int(kline[0]): kline for page in pages for kline in page}
+        return [merged[open_time] for open_time in sorted(merged)][-total:]
+    
+    def fetch_array(self, symbol: str, interval: str, limit: int = 60) -> np.ndarray:
+        """
+        获取最近 limit 根K线，返回 (N, 6) float64 数组：开盘时间、开、高、低、收、成交量
+        
+        已收盘的K线不会再变化，缓存到本地 .npy 文件；缓存命中时只请求
+        缓存最后一根之后的K线（通常只有一两根），再与缓存拼接。
+        同一分钟内以相同参数再次调用直接返回内存中的结果，不再请求接口；
+        返回的数组是只读的，可在多次 analyze_array 之间共享。
+        批量分析（analyze_symbols）不经过这层缓存，每个交易对分析完即释放。
+        
+        Args:
+            symbol: 交易对，如 'BTCUSDT'
+            interval: K线周期
+            limit: 获取数量
+            
+        Returns:
+            K线数组
+        """
+        return self._fetch_memo(symbol.upper(), interval, limit, int(time.time() // 60))
+    
+    def _fetch_minute_snapshot(self, symbol: str, interval: str, limit: int,
+                               window_end_minute: int) -> np.ndarray:
+        """获取并冻结K线数组供内存缓存保存；window_end_minute 只作为缓存键，到下一分钟自然失效"""
+        arr = self._fetch_array_uncached(symbol, interval, limit)
+        arr.setflags(write=False)
+        return arr
+    
+    def _fetch_array_uncached(self, symbol: str, interval: str, limit: int) -> np.ndarray:
+        path = self._cache_path(symbol, interval)
+        if path is None:
+            return self._parse_klines(self.get_klines(symbol, interval, limit))
+        
+        now_ms = int(time.time() * 1000)
+        cached = self._load_cache(path)
+        if cached is not None and len(cached) > 0:
+            last_open = int(cached[-1, 0])
+            missing = (now_ms - last_open) // self._interval_ms[interval] + 2
+            if missing <= self.MAX_KLINES_PER_REQUEST and len(cached) + missing >= limit:
+                try:
+                    tail = self._request_klines({
+                        'symbol': symbol.upper(),
+                        'interval': interval,
+                        'startTime': last_open + 1,
+                        'limit': missing
+                    })
+                except (requests.exceptions.RequestException, json.JSONDecodeError):
+                    tail = []
+                # 最新一根必须是未收盘K线，否则说明补拉不完整，退回全量获取
+                if tail and int(tail[-1][6]) >= now_ms and len(cached) + len(tail) >= limit:
+                    print(f"⚡ 使用 {symbol} {self.intervals.get(interval, interval)} K线缓存，补拉 {len(tail)} 根")
+                    # 缓存只保留最近 max(limit, 单次请求上限) 根，文件不会随运行次数无限增长，
+                    # 拼接时也只从 mmap 中读取这一截
+                    keep = max(limit, self.MAX_KLINES_PER_REQUEST)
+                    closed = np.concatenate([cached[-keep:], self._parse_klines(tail[:-1])])[-keep:]
+                    del cached
+                    self._save_cache(path, closed)
+                    return np.concatenate([closed, self._parse_klines(tail[-1:])])[-limit:]
+            del cached
+        
+        arr = self._parse_klines(self.get_klines(symbol, interval, limit))
+        # 开盘时间加一个周期不晚于当前时间即已收盘（1M 按 31 天算，只会把刚收盘的月线当成未收盘）
+        self._save_cache(path, arr[arr[:, 0] + self._interval_ms[interval] <= now_ms])
+        return arr
+    
+    @staticmethod
+    def _parse_klines(klines: List[List]) -> np.ndarray:
+        """
+        按列转置后一次性解析为 (N, 6) float64 数组（每列连续存放），取代逐行 float() 转换
+        
+        币安K线固定 12 列，任何一行格式异常都会让整体解析失败并抛出 ValueError。
+        """
+        if not klines:
+            return np.empty((0, 6), dtype=np.float64)
+        try:
+            columns = np.array(list(zip(*klines))[:6], dtype=np.float64)
+            if columns.shape[0] != 6:
+                raise ValueError(f"每根K线至少需要 6 列，实际为 {columns.shape[0]} 列")
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"K线数据格式错误: {e}") from e
+        return columns.T
+    
+    def _cache_path(self, symbol: str, interval: str) -> Optional[str]:
+        if not self.cache_dir or interval not in self._interval_ms:
+            return None
+        return os.path.join(self.cache_dir, f"{symbol.upper()}_{interval}.npy")
+    
+    def _load_cache(self, path: str) -> Optional[np.ndarray]:
+        try:
+            return np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+    
+    def _save_cache(self, path: str, closed: np.ndarray):
+        """写入已收盘K线（先写临时文件再替换，避免并发读到半个文件）"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(closed))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  写入K线缓存失败: {e}")
+    
+    def calculate_amplitude(self, klines: Union[List[List], np.ndarray], include_raw: bool = True) -> Dict:
         """
         计算振幅统计数据
         
         Args:
-            klines: K线数据
+            klines: K线数据（接口原始数据，或 fetch_array 返回的数组）
+            include_raw: 是否生成逐根K线明细 raw_data（仅保存文件时需要）
             
         Returns:
             振幅分析结果
         """
-        if not klines:
+        if len(klines) == 0:
             raise ValueError("K线数据为空")
             
-        amplitudes = []
-        kline_details = []
-        
         print("📊 正在计算振幅数据...")
         
-        for i, kline in enumerate(klines):
-            try:
-                timestamp = int(kline[0])
-                open_price = float(kline[1])
-                high_price = float(kline[2])
-                low_price = float(kline[3])
-                close_price = float(kline[4])
-                volume = float(kline[5])
-                
-                # 计算振幅百分比: (最高价 - 最低价) / 开盘价 * 100
-                if open_price > 0:
-                    amplitude = ((high_price - low_price) / open_price) * 100
-                else:
-                    amplitude = 0
-                    
-                amplitudes.append(amplitude)
-                
-                kline_detail = {
-                    'index': i + 1,
-                    'timestamp': timestamp,
-                    'datetime': datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S'),
-                    'open': open_price,
-                    'high': high_price,
-                    'low': low_price,
-                    'close': close_price,
-                    'volume': volume,
-                    'amplitude': amplitude
-                }
-                kline_details.append(kline_detail)
-                
-            except (ValueError, IndexError) as e:
-                print(f"⚠️  第 {i+1} 根K线数据解析错误: {e}")
-                continue
-        
-        if not amplitudes:
-            raise ValueError("没有有效的振幅数据")
+        arr = klines if isinstance(klines, np.ndarray) else self._parse_klines(klines)
+        return self.analyze_array(arr, include_raw)
+    
+    def analyze_array(self, arr: np.ndarray, include_raw: bool = False) -> Dict:
+        """
+        对 fetch_array 返回的 (N, 6) 数组计算振幅统计，不访问网络也不输出
         
-        # 计算统计指标
-        avg_amplitude = statistics.mean(amplitudes)
-        max_amplitude = max(amplitudes)
-        min_amplitude = min(amplitudes)
-        median_amplitude = statistics.median(amplitudes)
+        同一份数组可以反复分析（如调整参数后重算），无需重新获取K线。
         
-        # 计算标准差
-        if len(amplitudes) > 1:
-            std_deviation = statistics.stdev(amplitudes)
-        else:
-            std_deviation = 0
+        Args:
+            arr: K线数组
+            include_raw: 是否生成逐根K线明细 raw_data
             
-        # 找出极值K线
-        max_idx = amplitudes.index(max_amplitude)
-        min_idx = amplitudes.index(min_amplitude)
+        Returns:
+            振幅分析结果
+        """
+        timestamps = arr[:, 0].astype(np.int64)
+        opens, highs, lows, closes, volumes = np.ascontiguousarray(arr[:, 1:6].T)
+        if opens.size == 0:
+            raise ValueError("没有有效的振幅数据")
         
-        max_amplitude_kline = kline_details[max_idx]
-        min_amplitude_kline = kline_details[min_idx]
+        # 振幅与统计量整列向量化计算；样本标准差与 statistics.stdev 一致
+        amp = _amplitudes(opens, highs, lows)
+        avg_amplitude = float(amp.mean())
+        median_amplitude = float(np.median(amp))
+        std_deviation = float(amp.std(ddof=1)) if amp.size > 1 else 0.0
+        max_idx = int(amp.argmax())
+        min_idx = int(amp.argmin())
+        max_amplitude = float(amp[max_idx])
+        min_amplitude = float(amp[min_idx])
         
-        # 计算振幅区间分布
-        amplitude_ranges = self.calculate_amplitude_distribution(amplitudes)
+        # 明细字典只为两根极值K线构建
+        columns = (timestamps, opens, highs, lows, closes, volumes, amp)
+        max_amplitude_kline = self._kline_detail(max_idx, *(col[max_idx].item() for col in columns))
+        min_amplitude_kline = self._kline_detail(min_idx, *(col[min_idx].item() for col in columns))
         
-        return {
+        # 振幅区间分布
+        amplitude_ranges = self.calculate_amplitude_distribution(amp)
+        
+        results = {
             'summary': {
-                'total_klines': len(amplitudes),
+                'total_klines': int(amp.size),
                 'average_amplitude': avg_amplitude,
                 'median_amplitude': median_amplitude,
                 'max_amplitude': max_amplitude,
@@ -184,31 +395,51 @@ class BinanceKlineAnalyzer:
                 'max_amplitude_kline': max_amplitude_kline,
                 'min_amplitude_kline': min_amplitude_kline
             },
-            'distribution': amplitude_ranges,
-            'raw_data': kline_details
+            'distribution': amplitude_ranges
+        }
+        
+        if include_raw:
+            results['raw_data'] = [
+                self._kline_detail(i, *row, datetime_str=datetime_str)
+                for i, (row, datetime_str) in enumerate(zip(zip(*(col.tolist() for col in columns)),
+                                                            format_local_times(timestamps)))
+            ]
+        
+        return results
+    
+    @staticmethod
+    def _kline_detail(i: int, timestamp: int, open_price: float, high_price: float, low_price: float,
+                      close_price: float, volume: float, amplitude: float,
+                      datetime_str: Optional[str] = None) -> Dict:
+        """构建单根K线的明细字典，datetime_str 未给出时按本地时间格式化"""
+        if datetime_str is None:
+            datetime_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp // 1000))
+        return {
+            'index': i + 1,
+            'timestamp': timestamp,
+            'datetime': datetime_str,
+            'open': open_price,
+            'high': high_price,
+            'low': low_price,
+            'close': close_price,
+            'volume': volume,
+            'amplitude': amplitude
         }
     
-    def calculate_amplitude_distribution(self, amplitudes: List[float]) -> Dict:
+    def calculate_amplitude_distribution(self, amplitudes: np.ndarray) -> Dict:
         """计算振幅分布统计"""
-        if not amplitudes:
+        amplitudes = np.asarray(amplitudes, dtype=np.float64)
+        if amplitudes.size == 0:
             return {}
-            
-        # 定义振幅区间
-        ranges = [
-            (0, 1, "0-1%"),
-            (1, 2, "1-2%"),
-            (2, 3, "2-3%"),
-            (3, 5, "3-5%"),
-            (5, 10, "5-10%"),
-            (10, float('inf'), ">10%")
-        ]
+        
+        # 一次 np.histogram 完成全部分桶，区间为 [min, max)，与逐区间计数一致
+        counts, _ = np.histogram(amplitudes, bins=_AMPLITUDE_BIN_EDGES)
         
         distribution = {}
-        total = len(amplitudes)
+        total = int(amplitudes.size)
         
-        for min_val, max_val, label in ranges:
-            count = sum(1 for amp in amplitudes if min_val <= amp < max_val)
-            percentage = (count / total) * 100 if total > 0 else 0
+        for (_, _, label), count in zip(AMPLITUDE_RANGES, counts.tolist()):
+            percentage = (count / total) * 100
             distribution[label] = {
                 'count': count,
                 'percentage': percentage
@@ -217,53 +448,54 @@ class BinanceKlineAnalyzer:
         return distribution
     
     def print_analysis_results(self, results: Dict, symbol: str, interval: str):
-        """打印分析结果"""
-        print("\n" + "="*80)
-        print(f"📈 {symbol} - {self.intervals.get(interval, interval)} K线振幅分析报告")
-        print("="*80)
+        """打印分析结果（整份报告拼好后一次写出）"""
+        lines = []
+        lines.append("\n" + "="*80)
+        lines.append(f"📈 {symbol} - {self.intervals.get(interval, interval)} K线振幅分析报告")
+        lines.append("="*80)
         
         summary = results['summary']
         extremes = results['extremes']
         distribution = results['distribution']
         
         # 基础统计
-        print(f"\n📊 基础统计信息:")
-        print(f"   统计K线数量: {summary['total_klines']} 根")
-        print(f"   平均振幅:     {summary['average_amplitude']:.4f}%")
-        print(f"   中位数振幅:   {summary['median_amplitude']:.4f}%")
-        print(f"   最大振幅:     {summary['max_amplitude']:.4f}%")
-        print(f"   最小振幅:     {summary['min_amplitude']:.4f}%")
-        print(f"   标准差:       {summary['std_deviation']:.4f}%")
-        print(f"   振幅范围:     {summary['amplitude_range']:.4f}%")
+        lines.append(f"\n📊 基础统计信息:")
+        lines.append(f"   统计K线数量: {summary['total_klines']} 根")
+        lines.append(f"   平均振幅:     {summary['average_amplitude']:.4f}%")
+        lines.append(f"   中位数振幅:   {summary['median_amplitude']:.4f}%")
+        lines.append(f"   最大振幅:     {summary['max_amplitude']:.4f}%")
+        lines.append(f"   最小振幅:     {summary['min_amplitude']:.4f}%")
+        lines.append(f"   标准差:       {summary['std_deviation']:.4f}%")
+        lines.append(f"   振幅范围:     {summary['amplitude_range']:.4f}%")
         
         # 极值详情
-        print(f"\n🔝 最大振幅详情:")
+        lines.append(f"\n🔝 最大振幅详情:")
         max_kline = extremes['max_amplitude_kline']
-        print(f"   时间: {max_kline['datetime']}")
-        print(f"   开盘: {max_kline['open']:.6f}")
-        print(f"   最高: {max_kline['high']:.6f}")
-        print(f"   最低: {max_kline['low']:.6f}")
-        print(f"   收盘: {max_kline['close']:.6f}")
-        print(f"   成交量: {max_kline['volume']:.2f}")
-        print(f"   振幅: {max_kline['amplitude']:.4f}%")
-        
-        print(f"\n🔻 最小振幅详情:")
+        lines.append(f"   时间: {max_kline['datetime']}")
+        lines.append(f"   开盘: {max_kline['open']:.6f}")
+        lines.append(f"   最高: {max_kline['high']:.6f}")
+        lines.append(f"   最低: {max_kline['low']:.6f}")
+        lines.append(f"   收盘: {max_kline['close']:.6f}")
+        lines.append(f"   成交量: {max_kline['volume']:.2f}")
+        lines.append(f"   振幅: {max_kline['amplitude']:.4f}%")
+        
+        lines.append(f"\n🔻 最小振幅详情:")
         min_kline = extremes['min_amplitude_kline']
-        print(f"   时间: {min_kline['datetime']}")
-        print(f"   开盘: {min_kline['open']:.6f}")
-        print(f"   最高: {min_kline['high']:.6f}")
-        print(f"   最低: {min_kline['low']:.6f}")
-        print(f"   收盘: {min_kline['close']:.6f}")
-        print(f"   成交量: {min_kline['volume']:.2f}")
-        print(f"   振幅: {min_kline['amplitude']:.4f}%")
+        lines.append(f"   时间: {min_kline['datetime']}")
+        lines.append(f"   开盘: {min_kline['open']:.6f}")
+        lines.append(f"   最高: {min_kline['high']:.6f}")
+        lines.append(f"   最低: {min_kline['low']:.6f}")
+        lines.append(f"   收盘: {min_kline['close']:.6f}")
+        lines.append(f"   成交量: {min_kline['volume']:.2f}")
+        lines.append(f"   振幅: {min_kline['amplitude']:.4f}%")
         
         # 振幅分布
-        print(f"\n📈 振幅区间分布:")
+        lines.append(f"\n📈 振幅区间分布:")
         for range_label, data in distribution.items():
-            print(f"   {range_label:>8}: {data['count']:>3} 根 ({data['percentage']:>5.1f}%)")
+            lines.append(f"   {range_label:>8}: {data['count']:>3} 根 ({data['percentage']:>5.1f}%)")
         
         # 波动性评估
-        print(f"\n💡 波动性评估:")
+        lines.append(f"\n💡 波动性评估:")
         avg_amp = summary['average_amplitude']
         std_dev = summary['std_deviation']
         
@@ -278,26 +510,67 @@ class BinanceKlineAnalyzer:
         else:
             volatility = "极高"
             
-        print(f"   波动程度: {volatility}")
-        print(f"   稳定性: {'较稳定' if std_dev < avg_amp * 0.5 else '波动较大'}")
+        lines.append(f"   波动程度: {volatility}")
+        lines.append(f"   稳定性: {'较稳定' if std_dev < avg_amp * 0.5 else '波动较大'}")
         
-        print("\n" + "="*80)
+        lines.append("\n" + "="*80)
+        sys.stdout.write("\n".join(lines) + "\n")
     
-    def save_results_to_file(self, results: Dict, symbol: str, interval: str, filename: Optional[str] = None):
-        """保存结果到文件"""
+    def save_results_to_file(self, results: Dict, symbol: str, interval: str, filename: Optional[str] = None,
+                             save_format: str = 'json', klines: Optional[np.ndarray] = None):
+        """
+        保存结果到文件
+        
+        Args:
+            results: 分析结果
+            symbol: 交易对
+            interval: K线周期
+            filename: 文件名，默认按交易对、周期和时间生成
+            save_format: 'json' 保存完整结果；'parquet' 将逐根K线明细写入 {stem}.parquet（zstd 压缩），
+                         其余部分写入同名的 {stem}.json
+            klines: parquet 格式时的K线数组；未提供时从 results['raw_data'] 取
+        """
         if not filename:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"amplitude_analysis_{symbol}_{interval}_{timestamp}.json"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+            if save_format == 'parquet':
+                stem = os.path.splitext(filename)[0]
+                pq.write_table(self._raw_data_table(results, klines), f"{stem}.parquet", compression='zstd')
+                with open(f"{stem}.json", 'wb') as f:
+                    f.write(_json_dumps({key: value for key, value in results.items() if key != 'raw_data'}))
+                print(f"✅ 分析结果已保存到: {stem}.parquet, {stem}.json")
+                return
+            
+            with open(filename, 'wb') as f:
+                f.write(_json_dumps(results))
             print(f"✅ 分析结果已保存到: {filename}")
         except Exception as e:
             print(f"❌ 保存文件失败: {e}")
     
+    @staticmethod
+    def _raw_data_table(results: Dict, klines: Optional[np.ndarray]):
+        """逐根K线明细的列式表：ts（UTC 毫秒时间戳）、开、高、低、收、成交量、振幅"""
+        if pa is None:
+            raise RuntimeError("保存 parquet 需要安装 pyarrow")
+        if klines is not None:
+            ts = klines[:, 0].astype(np.int64)
+            opens, highs, lows, closes, volumes = np.ascontiguousarray(klines[:, 1:6].T)
+            amp = _amplitudes(opens, highs, lows)
+        else:
+            raw_data = results['raw_data']
+            ts = np.array([row['timestamp'] for row in raw_data], dtype=np.int64)
+            opens, highs, lows, closes, volumes, amp = (
+                np.array([row[key] for row in raw_data], dtype=np.float64)
+                for key in ('open', 'high', 'low', 'close', 'volume', 'amplitude'))
+        return pa.table({
+            'ts': pa.array(ts, type=pa.timestamp('ms', tz='UTC')),
+            'open': opens, 'high': highs, 'low': lows, 'close': closes, 'volume': volumes, 'amp': amp,
+        })
+    
     def analyze_symbol(self, symbol: str, interval: str = '15m', limit: int = 60, 
-                      save_to_file: bool = False) -> Dict:
+                      save_to_file: bool = False, save_format: str = 'json') -> Dict:
         """
         分析指定交易对的振幅
         
@@ -306,16 +579,65 @@ class BinanceKlineAnalyzer:
             interval: K线周期
             limit: K线数量
             save_to_file: 是否保存到文件
+            save_format: 保存格式，'json' 或 'parquet'
             
         Returns:
             分析结果
         """
         try:
-            # 获取K线数据
-            klines = self.get_klines(symbol, interval, limit)
+            # 获取K线数据（I/O 与计算分离，计算见 analyze_array）
+            klines = self.fetch_array(symbol, interval, limit)
+        except Exception as e:
+            print(f"❌ 分析失败: {e}")
+            return {}
+        
+        return self._analyze_klines(klines, symbol, interval, limit, save_to_file, save_format)
+    
+    def analyze_symbols(self, symbols: List[str], interval: str = '15m', limit: int = 60,
+                        save_to_file: bool = False, save_format: str = 'json') -> Dict[str, Dict]:
+        """
+        批量分析多个交易对的振幅
+        
+        K线获取在线程池中并发进行（网络等待期间释放 GIL）；
+        主线程按输入顺序，等到某个交易对的数据到达就立即计算并打印，
+        与其余交易对的获取重叠，处理完即释放该交易对的K线数组（不经过 fetch_array 的内存缓存）。
+        
+        Args:
+            symbols: 交易对列表（重复的交易对只分析一次）
+            interval: K线周期
+            limit: K线数量
+            save_to_file: 是否保存到文件
+            save_format: 保存格式，'json' 或 'parquet'
+            
+        Returns:
+            {交易对: 分析结果}，失败的交易对结果为空字典
+        """
+        symbols = list(dict.fromkeys(symbols))
+        all_results = {}
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, max(1, len(symbols)))) as executor:
+            futures = {symbol: executor.submit(self._fetch_array_uncached, symbol, interval, limit) for symbol in symbols}
             
+            for symbol in symbols:
+                future = futures.pop(symbol)
+                try:
+                    klines = future.result()
+                except Exception as e:
+                    print(f"❌ {symbol} 分析失败: {e}")
+                    all_results[symbol] = {}
+                    continue
+                all_results[symbol] = self._analyze_klines(klines, symbol, interval, limit,
+                                                            save_to_file, save_format)
+                del future, klines
+        
+        return all_results
+    
+    def _analyze_klines(self, klines: np.ndarray, symbol: str, interval: str, limit: int,
+                        save_to_file: bool, save_format: str = 'json') -> Dict:
+        """计算、打印并按需保存已获取K线的分析结果"""
+        try:
             # 计算振幅
-            results = self.calculate_amplitude(klines)
+            # parquet 直接从K线数组按列写出，不需要逐根明细字典
+            results = self.calculate_amplitude(klines, include_raw=save_to_file and save_format == 'json')
             
             # 添加元数据
             results['metadata'] = {
@@ -331,7 +653,7 @@ class BinanceKlineAnalyzer:
             
             # 保存文件
             if save_to_file:
-                self.save_results_to_file(results, symbol, interval)
+                self.save_results_to_file(results, symbol, interval, save_format=save_format, klines=klines)
             
             return results
             
@@ -343,20 +665,28 @@ class BinanceKlineAnalyzer:
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='币圈K线平均振幅统计工具')
-    parser.add_argument('--symbol', '-s', default='MYXUSDT', help='交易对 (默认: BTCUSDT)')
+    parser.add_argument('--symbol', '-s', nargs='+', default=['MYXUSDT'],
+                       help='交易对，可传多个并发分析 (默认: BTCUSDT)')
     parser.add_argument('--interval', '-i', default='1m', 
-                       choices=['1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', 
-                               '6h', '8h', '12h', '1d', '3d', '1w', '1M'],
+                       choices=list(INTERVAL_NAMES),
                        help='K线周期 (默认: 15m)')
-    parser.add_argument('--limit', '-l', type=int, default=1400, help='K线数量 (默认: 60)')
+    parser.add_argument('--limit', '-l', type=int, default=1400, help='K线数量，超过 1500 根时自动分段并发获取 (默认: 60)')
     parser.add_argument('--proxy', '-p', help='代理地址 (如: http://127.0.0.1:7890)')
-    parser.add_argument('--save', action='store_true', help='保存结果到JSON文件')
+    parser.add_argument('--save', action='store_true', help='保存结果到文件')
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json',
+                       help='--save 的文件格式，parquet 需要安装 pyarrow (默认: json)')
+    parser.add_argument('--no-cache', action='store_true', help='不使用本地K线缓存')
     
     args = parser.parse_args()
+    if args.format == 'parquet':
+        if not args.save:
+            parser.error('--format parquet 需要与 --save 一起使用')
+        if pa is None:
+            parser.error('--format parquet 需要安装 pyarrow')
     
     print("🚀 币圈K线平均振幅统计工具启动")
     print(f"📋 配置信息:")
-    print(f"   交易对: {args.symbol}")
+    print(f"   交易对: {', '.join(args.symbol)}")
     print(f"   K线周期: {args.interval}")
     print(f"   统计数量: {args.limit} 根")
     if args.proxy:
@@ -364,15 +694,26 @@ def main():
     print()
     
     # 创建分析器
-    analyzer = BinanceKlineAnalyzer(proxy_url=args.proxy)
+    analyzer = BinanceKlineAnalyzer(proxy_url=args.proxy, cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR)
     
     # 执行分析
-    results = analyzer.analyze_symbol(
-        symbol=args.symbol,
-        interval=args.interval,
-        limit=args.limit,
-        save_to_file=args.save
-    )
+    if len(args.symbol) == 1:
+        results = analyzer.analyze_symbol(
+            symbol=args.symbol[0],
+            interval=args.interval,
+            limit=args.limit,
+            save_to_file=args.save,
+            save_format=args.format
+        )
+    else:
+        all_results = analyzer.analyze_symbols(
+            symbols=args.symbol,
+            interval=args.interval,
+            limit=args.limit,
+            save_to_file=args.save,
+            save_format=args.format
+        )
+        results = all(all_results.values())
     
     if results:
         print("✅ 分析完成!")
@@ -392,6 +733,9 @@ python amplitude_analyzer.py --symbol BTCUSDT --interval 15m
 # 指定合约市场
 python amplitude_analyzer.py --symbol ETHUSDT --interval 1h --market futures
 
+# 多个交易对并发分析
+python amplitude_analyzer.py --symbol BTCUSDT ETHUSDT SOLUSDT --interval 1h
+
 # 现货市场分析
 python amplitude_analyzer.py --symbol BNBUSDT --interval 4h --market spot
 
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+ZF1 / ZF2 共用的K线时间格式化
+"""
+
+import time
+from typing import List
+
+import numpy as np
+
+
+def format_local_times(timestamps_ms: np.ndarray) -> List[str]:
+    """
+    毫秒时间戳批量格式化为本地时间 '%Y-%m-%d %H:%M:%S'
+
+    区间内本地 UTC 偏移不变时（绝大多数情况）整体用 NumPy datetime64 一次转换；
+    跨越夏令时切换时退回逐个 time.localtime。
+    """
+    if timestamps_ms.size == 0:
+        return []
+    secs = timestamps_ms // 1000
+    lo, hi = int(secs.min()), int(secs.max())
+    # 每 7 天探测一次 UTC 偏移，足以发现区间内的任何夏令时切换
+    offsets = {time.localtime(t).tm_gmtoff for t in (*range(lo, hi, 7 * 86400), hi)}
+    if len(offsets) > 1:
+        return [time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)) for t in secs.tolist()]
+    local = (secs + offsets.pop()).astype('datetime64[s]')
+    return [t.replace('T', ' ') for t in np.datetime_as_string(local, unit='s').tolist()]